@@ -1,28 +1,103 @@
-import io
+import collections
+import concurrent.futures
+import datetime
+import functools
 import mimetypes
 import os
+import pathlib
+import posixpath
+import random
+import re
+import tempfile
 import threading
+import time
 
 from django.conf import settings
-from django.core.exceptions import ImproperlyConfigured
+from django.core.exceptions import ImproperlyConfigured, SuspiciousFileOperation
 from django.core.files.base import File
 from django.core.files.storage import Storage
+from django.core.signals import request_started, setting_changed
 from django.utils.encoding import force_text
 from django.utils.functional import SimpleLazyObject
 from django.utils.http import urlquote
-from django.utils.six.moves.urllib import parse as urlparse
+from django.utils.six.moves.urllib.parse import quote
 
-import dateutil.parser
-import httplib2
+try:
+    from django.core.files.utils import validate_file_name
+except ImportError:  # Django < 2.2.21
+    validate_file_name = None
 
-from googleapiclient.discovery import build as discovery_build
+# httplib2, requests, googleapiclient.discovery/http and oauth2client take a
+# few hundred milliseconds to import and are imported where they are used, so
+# processes that never touch storage do not pay for them
 from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaIoBaseUpload, MediaIoBaseDownload
-from oauth2client.client import GoogleCredentials
 
 
 GCS_PUBLIC_READ_CACHE_DEFAULT = "public, max-age=3600"
 GCS_PUBLIC_READ_CACHE_DISABLED = "private, max-age=0"
+GCS_URL_TEMPLATE_DEFAULT = "https://storage.googleapis.com/{bucket}/{name}"
+GCS_JSON_API_OBJECT_URL = "https://storage.googleapis.com/storage/v1/b/{bucket}/o/{name}"
+GCS_JSON_API_UPLOAD_URL = "https://storage.googleapis.com/upload/storage/v1/b/{bucket}/o"
+
+# object names made only of these characters are left unchanged by urlquote
+_SAFE_URL_NAME_RE = re.compile(r"[A-Za-z0-9_\-./]+")
+
+# httplib2.Http is not thread safe, so clients are built once per thread and
+# shared by every storage instance of the same class within that thread.
+_thread_local = threading.local()
+
+# OAuth2 credentials are shared process-wide (per storage class) so access
+# tokens are fetched once and refreshed by a single thread shortly before
+# they expire.
+_credentials = {}
+_credentials_lock = threading.Lock()
+TOKEN_EXPIRY_MARGIN = datetime.timedelta(seconds=60)
+
+# requests sessions are thread safe and pool their connections, so a single
+# session per storage class (and retry setting) is shared by all threads.
+_sessions = {}
+_sessions_lock = threading.Lock()
+SESSION_POOL_CONNECTIONS = 10
+SESSION_POOL_MAXSIZE = 50
+
+# object metadata fetched within a thread is briefly cached so consecutive
+# exists/size/created_time/modified_time calls make a single request
+METADATA_CACHE_MAXSIZE = 1024
+# the JSON API accepts at most 100 calls per batch request
+BATCH_MAX_SIZE = 100
+
+# content smaller than this is uploaded in a single request; anything larger
+# (or of unknown size) uses a resumable upload sent in UPLOAD_CHUNKSIZE pieces
+RESUMABLE_UPLOAD_THRESHOLD = 8 * 1024 * 1024
+UPLOAD_CHUNKSIZE = 8 * 1024 * 1024
+
+# adaptive download chunks aim to take this long to read, based on the
+# harmonic mean of the bandwidth measured over the last few chunks
+ADAPTIVE_CHUNK_SECONDS = 0.5
+ADAPTIVE_CHUNK_SAMPLES = 8
+ADAPTIVE_CHUNK_MIN = 256 * 1024
+ADAPTIVE_CHUNK_MAX = 16 * 1024 * 1024
+
+# connections each event loop's aiohttp session may open to GCS
+ASYNC_CONNECTION_LIMIT = 100
+
+
+class _OffsetWriter(object):
+    """
+    File-like writer placing data at a fixed offset of a file descriptor, so
+    several threads can fill different ranges of the same file.
+    """
+
+    def __init__(self, fd, offset):
+        self.fd = fd
+        self.offset = offset
+
+    def write(self, data):
+        data = memoryview(data)
+        while data:
+            n = os.pwrite(self.fd, data, self.offset)
+            self.offset += n
+            data = data[n:]
 
 
 def safe_join(base, *paths):
@@ -41,24 +116,32 @@ def safe_join(base, *paths):
     base_path = base_path.rstrip("/")
     paths = [force_text(p) for p in paths]
 
-    final_path = base_path
-    for path in paths:
-        final_path = urlparse.urljoin(final_path.rstrip("/") + "/", path)
-
-    # Ensure final_path starts with base_path and that the next character after
-    # the final path is "/" (or nothing, in which case final_path must be
-    # equal to base_path).
+    # GCS object names have no scheme, query or fragment, so plain POSIX path
+    # joining gives the same result as urljoin at a fraction of the cost
+    final_path = posixpath.normpath(posixpath.join(base_path, *paths))
+    if final_path == ".":
+        final_path = ""
+    # normpath drops trailing slashes, but "dir/" and "dir" are different GCS
+    # objects; keep the slash where urljoin would have
+    if paths and final_path and posixpath.basename(paths[-1]) in ("", ".", ".."):
+        final_path += "/"
+
+    # Ensure final_path does not climb above its root, starts with base_path
+    # and that the next character after the final path is "/" (or nothing, in
+    # which case final_path must be equal to base_path).
     base_path_len = len(base_path)
-    if (not final_path.startswith(base_path) or
-            final_path[base_path_len:base_path_len + 1] not in ("", "/")):
+    if (final_path == ".." or final_path.startswith("../") or
+            not final_path.startswith(base_path) or
+            (base_path and final_path[base_path_len:base_path_len + 1] not in ("", "/"))):
         raise ValueError("the joined path is located outside of the base path"
                          " component")
 
     return final_path.lstrip("/")
 
 
+@functools.lru_cache(maxsize=1)
 def _gcs_file_storage_settings():
-    config = getattr(settings, "GAPC_STORAGE", {})
+    config = dict(getattr(settings, "GAPC_STORAGE", {}))
 
     def default_bucket():
         try:
@@ -71,22 +154,86 @@ def _gcs_file_storage_settings():
     config.setdefault("cache_control", GCS_PUBLIC_READ_CACHE_DEFAULT)
     config.setdefault("path_prefix", "")
     config.setdefault("num_retries", 0)
+    config.setdefault("stream_threshold", None)
+    config.setdefault("download_chunksize", 4 * 1024 * 1024)
+    config.setdefault("adaptive_download_chunksize", True)
+    config.setdefault("download_workers", 4)
+    config.setdefault("parallel_download_threshold", 32 * 1024 * 1024)
+    config.setdefault("metadata_cache_ttl", 2)
+    config.setdefault("http_cache", None)
 
     return config
 
 
+def _clear_storage_settings(setting, **kwargs):
+    if setting == "GAPC_STORAGE":
+        _gcs_file_storage_settings.cache_clear()
+
+
+setting_changed.connect(_clear_storage_settings)
+
+
+@functools.lru_cache(maxsize=1024)
+def _guess_mimetype(suffix):
+    """
+    Guess a mimetype from the dotted suffix of a file name (".tar.gz").
+    """
+    mimetype, _ = mimetypes.guess_type("f" + suffix)
+    if mimetype is None:
+        return "application/octet-stream"
+    return mimetype
+
+
+def _parse_rfc3339(value):
+    """
+    Parse the RFC 3339 timestamps (2016-12-20T18:55:02.372Z) returned by GCS.
+    """
+    return datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _retryable_error(exc):
+    """
+    Whether a failed JSON API call is worth retrying, using the same rule as
+    googleapiclient's HttpRequest.execute: server errors and rate limiting.
+    """
+    if not isinstance(exc, HttpError):
+        return False
+    status = int(exc.resp["status"])
+    return status >= 500 or status == 429
+
+
+def _metadata_cache():
+    try:
+        return _thread_local.metadata
+    except AttributeError:
+        cache = _thread_local.metadata = {}
+        return cache
+
+
+def _clear_metadata_cache(**kwargs):
+    _metadata_cache().clear()
+
+
+request_started.connect(_clear_metadata_cache)
+
+
 class GCSFile(File):
     """
     A file returned from Google Cloud Storage
+
+    generation is the GCS generation of the object that was read, when known.
     """
 
-    def __init__(self, file, name, storage):
+    def __init__(self, file, name, storage, generation=None):
         super(GCSFile, self).__init__(file, name)
         self._storage = storage
+        self.generation = generation
 
     def open(self, mode=None):
         if self.closed:
-            self.file = self._storage.open(self.name, mode or "rb").file
+            reopened = self._storage.open(self.name, mode or "rb")
+            self.file = reopened.file
+            self.generation = reopened.generation
         return super(GCSFile, self).open(mode)
 
 
@@ -99,27 +246,132 @@ class GoogleCloudStorage(Storage):
     """
 
     def __init__(self):
-        self.thread = threading.local()
         config = _gcs_file_storage_settings()
-        self.bucket = config["bucket"]
-        self.path_prefix = self.path_prefix if hasattr(self, "path_prefix") else config["path_prefix"]
+        # resolve the (lazy) bucket and prefix to plain strings once rather
+        # than on every request made with them
+        self.bucket = force_text(config["bucket"])
+        self.path_prefix = force_text(self.path_prefix if hasattr(self, "path_prefix") else config["path_prefix"])
         self.allow_overwrite = self.allow_overwrite if hasattr(self, "allow_overwrite") else config["allow_overwrite"]
         self.cache_control = self.cache_control if hasattr(self, "cache_control") else config["cache_control"]
         self.num_retries = self.num_retries if hasattr(self, "num_retries") else config["num_retries"]
+        self.stream_threshold = self.stream_threshold if hasattr(self, "stream_threshold") else config["stream_threshold"]
+        self.download_chunksize = self.download_chunksize if hasattr(self, "download_chunksize") else config["download_chunksize"]
+        self.adaptive_download_chunksize = self.adaptive_download_chunksize if hasattr(self, "adaptive_download_chunksize") else config["adaptive_download_chunksize"]
+        self.download_workers = self.download_workers if hasattr(self, "download_workers") else config["download_workers"]
+        self.parallel_download_threshold = self.parallel_download_threshold if hasattr(self, "parallel_download_threshold") else config["parallel_download_threshold"]
+        self.metadata_cache_ttl = self.metadata_cache_ttl if hasattr(self, "metadata_cache_ttl") else config["metadata_cache_ttl"]
+        self.http_cache = self.http_cache if hasattr(self, "http_cache") else config["http_cache"]
+        self._insert_body_cache = None
+        self._download_bandwidth = collections.deque(maxlen=ADAPTIVE_CHUNK_SAMPLES)
+        self._async_sessions = {}
+        self._url_template = config.get("url-template", GCS_URL_TEMPLATE_DEFAULT)
+        # templates ending in {name} are formatted and quoted up to the name
+        # once, leaving url() to append the quoted object name
+        self._url_prefix = None
+        if self._url_template.endswith("{name}"):
+            prefix = self._url_template[:-len("{name}")].format(bucket=self.bucket)
+            if "://" in prefix:
+                scheme, rest = prefix.split("://")
+                self._url_prefix = "{}://{}".format(scheme, urlquote(rest))
 
     def build_client(self):
-        credentials = self.get_oauth_credentials()
-        http = credentials.authorize(httplib2.Http())
+        import httplib2
+        from googleapiclient.discovery import build as discovery_build
+
+        http = self.credentials.authorize(httplib2.Http(cache=self.http_cache))
         # cache_discovery=False prevents 'ImportError: file_cache is unavailable when using oauth2client >= 4.0.0 or google-auth'
         return discovery_build("storage", "v1", http=http, cache_discovery=False)
 
+    @property
+    def _insert_body(self):
+        """
+        Object metadata sent with every upload, rebuilt only when
+        cache_control changes. googleapiclient only reads it.
+        """
+        body = self._insert_body_cache
+        if body is None or body["cacheControl"] != self.cache_control:
+            body = self._insert_body_cache = {"cacheControl": self.cache_control}
+        return body
+
+    def _thread_state(self):
+        """
+        Per-thread cache of clients for this storage class.
+        """
+        try:
+            states = _thread_local.states
+        except AttributeError:
+            states = _thread_local.states = {}
+        return states.setdefault(type(self), {})
+
     @property
     def client(self):
-        if not hasattr(self.thread, "client"):
-            self.thread.client = self.build_client()
-        return self.thread.client
+        state = self._thread_state()
+        if "client" not in state:
+            state["client"] = self.build_client()
+        return state["client"]
+
+    @property
+    def credentials(self):
+        credentials = _credentials.get(type(self))
+        if credentials is None or self._token_expiring(credentials):
+            with _credentials_lock:
+                credentials = _credentials.get(type(self))
+                if credentials is None:
+                    credentials = _credentials[type(self)] = self.get_oauth_credentials()
+                if self._token_expiring(credentials):
+                    import httplib2
+
+                    credentials.refresh(httplib2.Http())
+        return credentials
+
+    def _token_expiring(self, credentials):
+        if credentials.access_token is None or credentials.invalid:
+            return True
+        if credentials.token_expiry is None:
+            return False
+        return datetime.datetime.utcnow() + TOKEN_EXPIRY_MARGIN >= credentials.token_expiry
+
+    def build_session(self):
+        """
+        requests.Session used to stream object media from GCS.
+
+        httplib2 reads whole response bodies into memory, so media downloads
+        bypass it and go through a pooled requests session instead.
+        """
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        session = requests.Session()
+        retry = Retry(
+            total=self.num_retries,
+            backoff_factor=0.2,
+            status_forcelist=(500, 502, 503, 504),
+            raise_on_status=False
+        )
+        session.mount("https://", HTTPAdapter(
+            pool_connections=SESSION_POOL_CONNECTIONS,
+            pool_maxsize=SESSION_POOL_MAXSIZE,
+            max_retries=retry
+        ))
+        return session
+
+    @property
+    def session(self):
+        # the session retries requests itself, so instances of a class
+        # configured with different num_retries need their own
+        key = (type(self), self.num_retries)
+        session = _sessions.get(key)
+        if session is None:
+            with _sessions_lock:
+                session = _sessions.get(key)
+                if session is None:
+                    session = _sessions[key] = self.build_session()
+        return session
 
     def get_oauth_credentials(self):
+        from oauth2client.client import GoogleCredentials
+
         return self.create_scoped(GoogleCredentials.get_application_default())
 
     def create_scoped(self, credentials):
@@ -132,26 +384,185 @@ class GoogleCloudStorage(Storage):
 
         Useful for using a single bucket for static and media assets.
         """
+        if not self.path_prefix and not (
+                "//" in name or "/." in name or name.startswith(".") or name.endswith("/")):
+            # without a prefix, safe_join would only strip leading slashes
+            return name.lstrip("/")
         return safe_join(self.path_prefix, name)
 
     def get_gcs_object(self, name, ensure=True):
-        req = self.client.objects().get(bucket=self.bucket, object=self._prefixed_name(name))
-        try:
-            return req.execute(num_retries=self.num_retries)
-        except HttpError as exc:
-            if exc.resp["status"] == "404":
-                if ensure:
-                    raise IOError('object "{}/{}" does not exist'.format(self.bucket, self._prefixed_name(name)))
-                else:
-                    return None
-            raise
+        prefixed_name = self._prefixed_name(name)
+        entry = _metadata_cache().get((self.bucket, prefixed_name))
+        if entry is not None and entry[0] > time.time():
+            obj = entry[1]
+        else:
+            req = self.client.objects().get(bucket=self.bucket, object=prefixed_name)
+            try:
+                obj = req.execute(num_retries=self.num_retries)
+            except HttpError as exc:
+                if exc.resp["status"] != "404":
+                    raise
+                obj = None
+            self._cache_gcs_object(prefixed_name, obj)
+        if obj is None and ensure:
+            raise IOError('object "{}/{}" does not exist'.format(self.bucket, prefixed_name))
+        return obj
+
+    def batch_metadata(self, names):
+        """
+        Fetch the metadata of several objects using batched requests.
+
+        Returns a dict mapping each name to its GCS object resource (or None
+        when the object does not exist) and primes the metadata cache so
+        later calls for these names avoid a round-trip. Lookups failing with
+        a server error are retried up to num_retries times; any other error
+        is raised once every batch has run.
+        """
+        names = list(names)
+        results = {}
+        failures = {}
+        pending = names
+        for attempt in range(self.num_retries + 1):
+            if attempt:
+                # BatchHttpRequest.execute takes no num_retries, so retry with
+                # the same randomized exponential backoff as HttpRequest
+                time.sleep(random.random() * 2 ** attempt)
+            for start in range(0, len(pending), BATCH_MAX_SIZE):
+                chunk = pending[start:start + BATCH_MAX_SIZE]
+                batch = self.client.new_batch_http_request()
+                for name in chunk:
+                    prefixed_name = self._prefixed_name(name)
+
+                    def callback(request_id, response, exception, name=name, prefixed_name=prefixed_name):
+                        if exception is not None:
+                            if not isinstance(exception, HttpError) or exception.resp["status"] != "404":
+                                # raising here would abort the rest of the batch
+                                failures[name] = exception
+                                return
+                            response = None
+                        failures.pop(name, None)
+                        self._cache_gcs_object(prefixed_name, response)
+                        results[name] = response
+
+                    batch.add(self.client.objects().get(bucket=self.bucket, object=prefixed_name), callback=callback)
+                try:
+                    batch.execute()
+                except HttpError as exc:
+                    for name in chunk:
+                        if name not in results:
+                            failures[name] = exc
+            pending = [name for name, exc in failures.items() if _retryable_error(exc)]
+            if not pending:
+                break
+        if failures:
+            raise next(iter(failures.values()))
+        return results
+
+    def _cache_gcs_object(self, prefixed_name, obj):
+        if not self.metadata_cache_ttl:
+            return
+        cache = _metadata_cache()
+        if len(cache) >= METADATA_CACHE_MAXSIZE:
+            cache.clear()
+        cache[(self.bucket, prefixed_name)] = (time.time() + self.metadata_cache_ttl, obj)
+
+    def _uncache_gcs_object(self, prefixed_name):
+        _metadata_cache().pop((self.bucket, prefixed_name), None)
 
     def _open_io(self):
         """
         io.IOBase instance to use for reading files from GCS.
         """
-        # default IO is in-memory (not ideal, but works great for small files)
-        return io.BytesIO()
+        # kept in memory up to 8 MiB, then spooled to a temporary file on disk
+        return tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024, mode="w+b")
+
+    def _download_chunksize(self):
+        """
+        Number of bytes to read per chunk when downloading.
+        """
+        samples = list(self._download_bandwidth)
+        if not self.adaptive_download_chunksize or not samples:
+            return self.download_chunksize
+        bandwidth = len(samples) / sum(1.0 / sample for sample in samples)
+        return max(ADAPTIVE_CHUNK_MIN, min(ADAPTIVE_CHUNK_MAX, int(bandwidth * ADAPTIVE_CHUNK_SECONDS)))
+
+    def _copy_media(self, response, buf, limit=None):
+        """
+        Copy a streamed media response into buf, stopping after limit bytes
+        when given.
+        """
+        try:
+            while limit is None or limit > 0:
+                chunksize = self._download_chunksize()
+                size = chunksize if limit is None else min(chunksize, limit)
+                started = time.perf_counter()
+                chunk = response.raw.read(size)
+                elapsed = time.perf_counter() - started
+                if not chunk:
+                    break
+                buf.write(chunk)
+                if limit is not None:
+                    limit -= len(chunk)
+                # short reads happen at the end of the body and would
+                # underestimate the bandwidth
+                if self.adaptive_download_chunksize and len(chunk) == size and elapsed > 0:
+                    self._download_bandwidth.append(len(chunk) / elapsed)
+        finally:
+            response.close()
+
+    def _get_media(self, uri, headers=None):
+        headers = dict(headers or {})
+        credentials = self.credentials
+        access_token = credentials.access_token
+        headers["Authorization"] = "Bearer {}".format(access_token)
+        response = self.session.get(uri, headers=headers, stream=True)
+        if response.status_code == 401:
+            # the access token was revoked or expired early: refresh it
+            # (unless another thread already has) and retry once
+            import httplib2
+
+            response.close()
+            with _credentials_lock:
+                if credentials.access_token == access_token:
+                    credentials.refresh(httplib2.Http())
+            headers["Authorization"] = "Bearer {}".format(credentials.access_token)
+            response = self.session.get(uri, headers=headers, stream=True)
+        response.raw.decode_content = True
+        return response
+
+    def _download_parallel(self, uri, response, size, generation):
+        """
+        Download a large object into a pre-sized temporary file using
+        concurrent ranged requests. The already open response supplies the
+        first range; the others are pinned to the same object generation.
+        """
+        if generation is not None:
+            uri = "{}&ifGenerationMatch={}".format(uri, generation)
+        slice_size = -(-size // self.download_workers)
+        f = tempfile.TemporaryFile()
+        os.ftruncate(f.fileno(), size)
+
+        def fetch(start):
+            end = min(start + slice_size, size) - 1
+            if start == 0:
+                part = response
+            else:
+                part = self._get_media(uri, {"Range": "bytes={}-{}".format(start, end)})
+                if part.status_code != 206:
+                    part.close()
+                    if part.status_code == 412:
+                        raise IOError("object changed while it was being downloaded")
+                    raise IOError("unknown HTTP error: {} {}".format(part.status_code, part.reason))
+            self._copy_media(part, _OffsetWriter(f.fileno(), start), limit=end - start + 1)
+
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.download_workers) as executor:
+                list(executor.map(fetch, range(0, size, slice_size)))
+        except Exception:
+            response.close()
+            f.close()
+            raise
+        return f
 
     # Django Storage interface
 
@@ -159,37 +570,93 @@ class GoogleCloudStorage(Storage):
         if mode != "rb":
             raise ValueError("rb is the only acceptable mode for this backend")
         req = self.client.objects().get_media(bucket=self.bucket, object=self._prefixed_name(name))
-        buf = self._open_io()
-        media = MediaIoBaseDownload(buf, req)
-        done = False
-        try:
-            while not done:
-                done = media.next_chunk(num_retries=self.num_retries)[1]
-        except HttpError as exc:
-            if exc.resp["status"] == "404":
+        response = self._get_media(req.uri)
+        if response.status_code != 200:
+            response.close()
+            if response.status_code == 404:
                 raise IOError('object "{}/{}" does not exist'.format(self.bucket, self._prefixed_name(name)))
-            else:
-                raise IOError("unknown HTTP error: {}".format(exc))
+            raise IOError("unknown HTTP error: {} {}".format(response.status_code, response.reason))
+        generation = response.headers.get("X-Goog-Generation")
+        size = None
+        if "Content-Encoding" not in response.headers and "Content-Length" in response.headers:
+            size = int(response.headers["Content-Length"])
+        if (size is not None and size >= self.parallel_download_threshold and
+                self.download_workers > 1 and hasattr(os, "pwrite")):
+            return GCSFile(self._download_parallel(req.uri, response, size, generation), name, self, generation)
+        if self.stream_threshold is not None and size is not None and size > self.stream_threshold:
+            # streaming is opt-in, as the returned file is not seekable
+            f = GCSFile(response.raw, name, self, generation)
+            f.DEFAULT_CHUNK_SIZE = self._download_chunksize()
+            f.size = size
+            return f
+        # objects are otherwise read up front so the returned file is seekable
+        # and has a size, even when stored with a Content-Encoding
+        buf = self._open_io()
+        self._copy_media(response, buf)
         buf.seek(0)
-        return GCSFile(buf, name, self)
-
-    def _save(self, name, content):
-        mimetype, _ = mimetypes.guess_type(os.path.basename(name))
-        if mimetype is None:
-            mimetype = "application/octet-stream"
-        media = MediaIoBaseUpload(content, mimetype)
-        req = self.client.objects().insert(
-            bucket=self.bucket,
-            name=self._prefixed_name(name),
-            body={
-                "cacheControl": self.cache_control
-            },
-            media_body=media
-        )
-        req.execute(num_retries=self.num_retries)
+        return GCSFile(buf, name, self, generation)
+
+    def save(self, name, content, max_length=None):
+        """
+        Storage.save(), passing max_length on to _save so names picked after
+        a conflict respect it too.
+        """
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        name = self.get_available_name(name, max_length=max_length)
+        name = self._save(name, content, max_length=max_length)
+        # ensure the name returned from the storage system is still valid
+        if validate_file_name is not None:
+            validate_file_name(name, allow_relative_path=True)
+        return name
+
+    def _save(self, name, content, max_length=None):
+        from googleapiclient.http import MediaIoBaseUpload
+
+        basename = os.path.basename(name)
+        mimetype = _guess_mimetype(basename[basename.find("."):] if "." in basename else "")
+        size = getattr(content, "size", None)
+        if size is not None and size < RESUMABLE_UPLOAD_THRESHOLD:
+            media = MediaIoBaseUpload(content, mimetype, chunksize=-1, resumable=False)
+        else:
+            media = MediaIoBaseUpload(content, mimetype, chunksize=UPLOAD_CHUNKSIZE, resumable=True)
+        params = {}
+        if not self.allow_overwrite:
+            # GCS rejects the insert with a 412 if the object already exists
+            params["ifGenerationMatch"] = 0
+        req = None
+        try:
+            while True:
+                req = self.client.objects().insert(
+                    bucket=self.bucket,
+                    name=self._prefixed_name(name),
+                    body=self._insert_body,
+                    media_body=media,
+                    **params
+                )
+                try:
+                    req.execute(num_retries=self.num_retries)
+                except HttpError as exc:
+                    if exc.resp["status"] != "412":
+                        raise
+                    req = None
+                    self._uncache_gcs_object(self._prefixed_name(name))
+                    name = super(GoogleCloudStorage, self).get_available_name(name, max_length)
+                    content.seek(0)
+                else:
+                    break
+        finally:
+            # the request and media reference the content and, for single
+            # request uploads, hold a copy of its bytes; drop them now rather
+            # than when this frame (or a traceback holding it) goes away
+            media = req = None
+        self._uncache_gcs_object(self._prefixed_name(name))
         return name
 
     def delete(self, name):
+        self._uncache_gcs_object(self._prefixed_name(name))
         req = self.client.objects().delete(bucket=self.bucket, object=self._prefixed_name(name))
         try:
             return req.execute(num_retries=self.num_retries)
@@ -205,21 +672,193 @@ class GoogleCloudStorage(Storage):
         return int(self.get_gcs_object(name)["size"])
 
     def url(self, name):
-        url_template = _gcs_file_storage_settings().get(
-            "url-template",
-            "https://storage.googleapis.com/{bucket}/{name}"
-        )
-        url = url_template.format(bucket=self.bucket, name=self._prefixed_name(name))
+        name = self._prefixed_name(name)
+        if self._url_prefix is not None:
+            return self._url_prefix + (name if _SAFE_URL_NAME_RE.fullmatch(name) else urlquote(name))
+        url = self._url_template.format(bucket=self.bucket, name=name)
         scheme, rest = url.split("://")
         return "{}://{}".format(scheme, urlquote(rest))
 
     def created_time(self, name):
-        return dateutil.parser.parse(self.get_gcs_object(name)["timeCreated"])
+        return _parse_rfc3339(self.get_gcs_object(name)["timeCreated"])
 
     def modified_time(self, name):
-        return dateutil.parser.parse(self.get_gcs_object(name)["updated"])
+        return _parse_rfc3339(self.get_gcs_object(name)["updated"])
 
     def get_available_name(self, name, max_length=None):
-        if self.allow_overwrite:
+        # the same name checks as Storage.get_available_name, which is
+        # skipped below for most names
+        name = str(name).replace("\\", "/")
+        dir_name, file_name = os.path.split(name)
+        if ".." in pathlib.PurePath(dir_name).parts:
+            raise SuspiciousFileOperation("Detected path traversal attempt in '{}'".format(dir_name))
+        if validate_file_name is not None:
+            validate_file_name(file_name)
+        # name collisions are detected by _save using a generation
+        # precondition, so only names that are too long need changing here
+        if self.allow_overwrite or not max_length or len(name) <= max_length:
             return name
         return super(GoogleCloudStorage, self).get_available_name(name, max_length)
+
+    # async Storage interface
+    #
+    # These talk to the JSON API directly over aiohttp (pip install
+    # django-gapc-storage[async]) so concurrent storage calls made from async
+    # code do not block each other or the event loop.
+
+    def _async_session(self):
+        """
+        aiohttp.ClientSession for the running event loop. aiohttp sessions are
+        bound to the loop they were created in, so one is kept per loop.
+        """
+        import asyncio
+        import aiohttp
+
+        loop = asyncio.get_running_loop()
+        # sessions of loops closed without aclose() are dropped, so the
+        # storage does not keep old event loops alive
+        for closed in [other for other in list(self._async_sessions) if other.is_closed()]:
+            self._async_sessions.pop(closed, None)
+        session = self._async_sessions.get(loop)
+        if session is None or session.closed:
+            session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=ASYNC_CONNECTION_LIMIT))
+            self._async_sessions[loop] = session
+        return session
+
+    async def aclose(self):
+        """
+        Close the aiohttp session of the running event loop. Call this
+        before the loop is closed.
+        """
+        import asyncio
+
+        session = self._async_sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await session.close()
+
+    async def _aauth_headers(self):
+        credentials = _credentials.get(type(self))
+        if credentials is None or self._token_expiring(credentials):
+            import asyncio
+
+            # loading or refreshing credentials makes blocking HTTP requests
+            credentials = await asyncio.get_running_loop().run_in_executor(None, lambda: self.credentials)
+        return {"Authorization": "Bearer {}".format(credentials.access_token)}
+
+    def _object_url(self, prefixed_name):
+        return GCS_JSON_API_OBJECT_URL.format(
+            bucket=quote(self.bucket, safe=""),
+            name=quote(prefixed_name, safe="")
+        )
+
+    async def aget_gcs_object(self, name, ensure=True):
+        prefixed_name = self._prefixed_name(name)
+        entry = _metadata_cache().get((self.bucket, prefixed_name))
+        if entry is not None and entry[0] > time.time():
+            obj = entry[1]
+        else:
+            headers = await self._aauth_headers()
+            async with self._async_session().get(self._object_url(prefixed_name), headers=headers) as response:
+                if response.status == 404:
+                    obj = None
+                elif response.status != 200:
+                    raise IOError("unknown HTTP error: {} {}".format(response.status, response.reason))
+                else:
+                    obj = await response.json()
+            self._cache_gcs_object(prefixed_name, obj)
+        if obj is None and ensure:
+            raise IOError('object "{}/{}" does not exist'.format(self.bucket, prefixed_name))
+        return obj
+
+    async def aexists(self, name):
+        return await self.aget_gcs_object(name, ensure=False) is not None
+
+    async def asize(self, name):
+        return int((await self.aget_gcs_object(name))["size"])
+
+    async def aopen(self, name, mode="rb"):
+        import asyncio
+
+        if mode != "rb":
+            raise ValueError("rb is the only acceptable mode for this backend")
+        prefixed_name = self._prefixed_name(name)
+        headers = await self._aauth_headers()
+        url = self._object_url(prefixed_name)
+        async with self._async_session().get(url, params={"alt": "media"}, headers=headers) as response:
+            if response.status == 404:
+                raise IOError('object "{}/{}" does not exist'.format(self.bucket, prefixed_name))
+            if response.status != 200:
+                raise IOError("unknown HTTP error: {} {}".format(response.status, response.reason))
+            buf = self._open_io()
+            loop = asyncio.get_running_loop()
+            # the buffer spools to disk, so writes happen in an executor; data
+            # is gathered into download_chunksize pieces first so that is not
+            # done for every small network read
+            pending = bytearray()
+            async for chunk in response.content.iter_chunked(self.download_chunksize):
+                pending += chunk
+                if len(pending) >= self.download_chunksize:
+                    await loop.run_in_executor(None, buf.write, pending)
+                    pending = bytearray()
+            if pending:
+                await loop.run_in_executor(None, buf.write, pending)
+            generation = response.headers.get("X-Goog-Generation")
+        await loop.run_in_executor(None, buf.seek, 0)
+        return GCSFile(buf, name, self, generation)
+
+    async def asave(self, name, content, max_length=None):
+        """
+        Async counterpart of Storage.save().
+        """
+        import asyncio
+
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        # shortening long names can check exists() with blocking requests
+        name = await asyncio.get_running_loop().run_in_executor(
+            None,
+            functools.partial(self.get_available_name, name, max_length=max_length)
+        )
+        return await self._asave(name, content, max_length=max_length)
+
+    async def _asave(self, name, content, max_length=None):
+        import asyncio
+        import aiohttp
+
+        loop = asyncio.get_running_loop()
+
+        async def media():
+            # reading the content may hit the disk, so it happens in an executor
+            chunks = content.chunks()
+            while True:
+                chunk = await loop.run_in_executor(None, next, chunks, None)
+                if chunk is None:
+                    break
+                yield chunk
+
+        params = {"uploadType": "multipart"}
+        if not self.allow_overwrite:
+            params["ifGenerationMatch"] = "0"
+        while True:
+            basename = os.path.basename(name)
+            mimetype = _guess_mimetype(basename[basename.find("."):] if "." in basename else "")
+            with aiohttp.MultipartWriter("related") as writer:
+                writer.append_json(dict(self._insert_body, name=self._prefixed_name(name)))
+                writer.append(media(), {"Content-Type": mimetype})
+            headers = await self._aauth_headers()
+            url = GCS_JSON_API_UPLOAD_URL.format(bucket=quote(self.bucket, safe=""))
+            async with self._async_session().post(url, params=params, data=writer, headers=headers) as response:
+                if response.status == 200:
+                    break
+                if response.status != 412:
+                    raise IOError("unknown HTTP error: {} {}".format(response.status, response.reason))
+            self._uncache_gcs_object(self._prefixed_name(name))
+            # picking a new name checks exists() with blocking requests
+            name = await loop.run_in_executor(
+                None,
+                functools.partial(super(GoogleCloudStorage, self).get_available_name, name, max_length)
+            )
+        self._uncache_gcs_object(self._prefixed_name(name))
+        return name
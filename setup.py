@@ -11,11 +11,15 @@ setup(
     license="BSD",
     url="http://github.com/eldarion/django-gapc-storage",
     packages=find_packages(),
+    python_requires=">=3.7",
     install_requires=[
         "google-api-python-client>=1.5.0,<=1.11",
         "oauth2client",
-        "python-dateutil",
+        "requests",
     ],
+    extras_require={
+        "async": ["aiohttp"],
+    },
     classifiers=[
         "Development Status :: 3 - Alpha",
         "Environment :: Web Environment",